@@ -1,15 +1,25 @@
 from pathlib import Path
+import copy
 import os.path as ospath
 
-import tomllib
-import tomlkit
+try:
+    import tomli_rs as _toml_loader
+except ImportError:
+    import tomllib as _toml_loader
 
-import re
-from datetime import date
+from datetime import date, time
+
+_MODULE_DIR = Path(ospath.dirname(ospath.realpath(__file__)))
+_WATCHLIST_DIR = _MODULE_DIR / "lists"
+_ARCHIVE_DIR = _MODULE_DIR / "archive"
+
+# Default keys in every Watchlist TOML file.
+_DEFAULT_KEYS = frozenset(('title', 'stocks', 'version', 'date'))
 
 def _create_toml_document_object(name:str, tickers:list, version:str, date:str, metadata:dict):
     """
-    Returns a tomlkit.TOMLDocument object with the given parameters.
+    Returns a dictionary representing a watchlist TOML document with the given parameters.
+    Keys are ordered title, stocks, version, date, followed by the metadata keys.
 
     Parameters:
     -----------
@@ -19,16 +29,79 @@ def _create_toml_document_object(name:str, tickers:list, version:str, date:str,
     - date
     - metadata
     """
-    doc: tomlkit.TOMLDocument = tomlkit.document()
-    doc.add("title", name)
-    doc.add("stocks", tickers)
-    doc.add("version", version)
-    doc.add("date", date)
-    for key in metadata.keys():
-        doc.add(key, metadata[key])
+    doc: dict = {"title": name, "stocks": tickers, "version": version, "date": date}
+    doc.update(metadata)
     
     return doc
 
+# Control characters (U+0000-U+001F, U+007F) are written as \uXXXX unless TOML has a short escape.
+_TOML_ESCAPES = str.maketrans({
+    **{chr(code): f"\\u{code:04X}" for code in [*range(0x20), 0x7F]},
+    '\\': '\\\\',
+    '"': '\\"',
+    '\b': '\\b',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\f': '\\f',
+    '\r': '\\r',
+})
+
+_TOML_BARE_KEY_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-")
+
+def _dump_toml_key(key: str) -> str:
+    """
+    !!!INTERNAL METHOD!!!
+    This method should only be used by the Watchlists library classes and functions. Outside use
+    is not suggested and may result in broken code and unexpected behavior.
+
+    Description:
+    ------------
+    Returns the TOML representation of a key, quoting it unless it is a valid bare key.
+    """
+    if key and _TOML_BARE_KEY_CHARS.issuperset(key):
+        return key
+    return '"' + key.translate(_TOML_ESCAPES) + '"'
+
+def _dump_toml_value(value) -> str:
+    """
+    !!!INTERNAL METHOD!!!
+    This method should only be used by the Watchlists library classes and functions. Outside use
+    is not suggested and may result in broken code and unexpected behavior.
+
+    Description:
+    ------------
+    Returns the TOML representation of a single watchlist value.
+    """
+    if isinstance(value, str):
+        return '"' + value.translate(_TOML_ESCAPES) + '"'
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (date, time)):
+        # Covers datetime as well, which is a subclass of date
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join([_dump_toml_value(v) for v in value]) + "]"
+    if isinstance(value, dict):
+        # Tables are written inline so they can sit among the top-level keys
+        return "{" + ", ".join([f"{_dump_toml_key(k)} = {_dump_toml_value(v)}" for k, v in value.items()]) + "}"
+    raise ValueError(f"Unsupported value type in watchlist: {type(value).__name__}")
+
+def _dump_watchlist(d: dict) -> str:
+    """
+    !!!INTERNAL METHOD!!!
+    This method should only be used by the Watchlists library classes and functions. Outside use
+    is not suggested and may result in broken code and unexpected behavior.
+
+    Description:
+    ------------
+    Returns a TOML string for a watchlist dictionary (title, stocks, version, date and
+    meta data). Keys are written in the dictionary's insertion order and nested tables are
+    written inline.
+    """
+    return "".join([f"{_dump_toml_key(key)} = {_dump_toml_value(value)}\n" for key, value in d.items()])
+
 def _get_archive_directory():
     """
     !!!INTERNAL METHOD!!!
@@ -39,7 +112,7 @@ def _get_archive_directory():
     ------------
     Returns the path to the complementary archive folder.
     """
-    return Path( ospath.dirname( ospath.realpath(__file__) ) ) / "archive"
+    return _ARCHIVE_DIR
 
 def _get_watchlist_directory():
     """
@@ -51,7 +124,7 @@ def _get_watchlist_directory():
     ------------
     Returns the path to the TOML watchlist files.
     """
-    return Path( ospath.dirname( ospath.realpath(__file__) ) ) / "lists"
+    return _WATCHLIST_DIR
 
 def _is_date(dt: str) -> bool:
     """
@@ -63,16 +136,15 @@ def _is_date(dt: str) -> bool:
     ------------
     Checks whether the given date is in YYYY-MM-DD format. Also checks whether dt is a real date.
     """
-    date_pattern = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}", re.IGNORECASE)
-    if date_pattern.match(dt):
-        year, month, day = dt.split('-')
-        try:
-            date(int(year), int(month), int(day))
-            return True
-        except ValueError:
-            return False
-    else:
+    if not (len(dt) == 10 and dt[4] == '-' and dt[7] == '-' and dt.isascii()
+            and dt[:4].isdigit() and dt[5:7].isdigit() and dt[8:].isdigit()):
         raise AttributeError
+    
+    try:
+        date(int(dt[:4]), int(dt[5:7]), int(dt[8:]))
+        return True
+    except ValueError:
+        return False
 
 def _is_future_date(dt:str) -> bool:
     """
@@ -103,10 +175,7 @@ def _is_toml(filename:str) -> bool:
         return False
 
     # Check for TOML file extension
-    if not filename.upper().endswith(".TOML"):
-        return False
-
-    return True
+    return len(filename) >= 5 and filename[-5:].lower() == ".toml"
 
 def _verify_and_clean_date(watchlist_date: str):
     """
@@ -118,7 +187,12 @@ def _verify_and_clean_date(watchlist_date: str):
     if watchlist_date == "":
         return watchlist_date
     else:
-        if _is_date(watchlist_date) and not _is_future_date(watchlist_date):
+        try:
+            is_date: bool = _is_date(watchlist_date)
+        except AttributeError:
+            raise ValueError("Must provide date in format YYYY-MM-DD.")
+        
+        if is_date and not _is_future_date(watchlist_date):
             return watchlist_date
 
     raise ValueError("Must provide date in format YYYY-MM-DD.")
@@ -130,13 +204,14 @@ def _verify_and_clean_list(watchlist_list:list):
     if watchlist_list is None or not watchlist_list:
         raise ValueError("Provide a list of at least 1 stock ticker in watchlist.")
     
-    _tickers: list = []
-    for ticker in watchlist_list:
-        if type(ticker) != str:
-            raise ValueError("A non-string value was detected in the list of stocks. Provide only strings")
-        
-        _tickers.append(ticker)
-    
+    # Copy first, so one-pass iterables are only consumed once
+    _tickers: list = list(watchlist_list)
+    if not _tickers:
+        raise ValueError("Provide a list of at least 1 stock ticker in watchlist.")
+
+    if not all(isinstance(ticker, str) for ticker in _tickers):
+        raise ValueError("A non-string value was detected in the list of stocks. Provide only strings")
+
     _tickers.sort()
 
     return _tickers
@@ -148,17 +223,15 @@ def _verify_and_clean_metadata(meta_data:dict):
     if meta_data is None:
         raise ValueError("Metadata cannot be provided as Nonetype.")
 
-    cleaned_metadata: dict = {}
-    for key in meta_data.keys():
-        value = meta_data[key]
+    for key, value in meta_data.items():
+        if key in _DEFAULT_KEYS:
+            raise ValueError(f"Key {key} in meta data is a default watchlist key (title, stocks, version, date).")
         if value is None:
             raise ValueError(f"Value of key {key} in meta data cannot be None.")
-        if type(meta_data[key]) != str:
+        if not isinstance(value, str):
             raise ValueError(f"Value of key {key} in meta data must be a string.")
-        
-        cleaned_metadata[key] = value
     
-    return cleaned_metadata
+    return meta_data
 
 def _verify_and_clean_watchlist_name(watchlist_name:str):
     """
@@ -179,8 +252,8 @@ def _verify_and_clean_version(version):
     if version is None:
         raise ValueError("Version cannot be Nonetype.")
     
-    if type(version) != str:
-        if type(version) == int or type(version) == float:
+    if not isinstance(version, str):
+        if isinstance(version, (int, float)) and not isinstance(version, bool):
             return str(version)
         else:
             raise ValueError("Version must be a string.")
@@ -206,6 +279,8 @@ def _watchlist_exists(filename:str) -> bool:
 
 
 class Watchlist:
+    __slots__ = ("_filepath", "_toml_dict")
+
     def __init__(self, filename:str):
         """
         Watchlist allows you to interact with an individual TOML file holding a stock watchlist.
@@ -234,10 +309,24 @@ class Watchlist:
         # Define and sync dict associated with the given TOML file.
         self._toml_dict: dict = {}
         self._update_toml_dict()
-
-        # Defines a list of default keys in every Watchlist TOML file.
-        self._default_keys = ['title', 'stocks', 'version', 'date']
     
+    @classmethod
+    def _from_dict(cls, filename:str, toml_dict:dict):
+        """
+        !!!INTERNAL METHOD!!!
+        This method should only be used by the Watchlists library classes and functions. Outside use
+        is not suggested and may result in broken code and unexpected behavior.
+
+        Description:
+        ------------
+        Returns a Watchlist for a TOML file that was just written from toml_dict, without
+        re-reading and re-parsing the file.
+        """
+        watchlist = cls.__new__(cls)
+        watchlist._filepath = _get_watchlist_directory() / filename
+        watchlist._toml_dict = toml_dict
+        return watchlist
+
     def _update_toml_dict(self):
         """
         !!!INTERNAL METHOD!!!
@@ -250,11 +339,9 @@ class Watchlist:
         """
         try:
             with open(str(self._filepath), 'rb') as watchlist_file:
-                self._toml_dict = tomllib.load(watchlist_file)
+                self._toml_dict = _toml_loader.load(watchlist_file)
         except Exception as e:
             print("EXCEPTION: Something went wrong opening TOML file when updating internal Watchlist model.")
-        finally:
-            watchlist_file.close()
     
     def add_meta_data(self, key: str, value:str):
         """
@@ -279,10 +366,14 @@ class Watchlist:
         """
         if ticker is None: raise ValueError("Ticker cannot be None-type.")
 
-        stock_list: list = self.get_list()
-        if ticker.upper() not in stock_list:
+        ticker = ticker.upper()
+
+        stock_list: list = list(self.get_list())
+        if ticker not in stock_list:
             stock_list.append(ticker)
         
+        # The list may not be sorted (update_list and hand-edited files do not sort it).
+        # Sorting a sorted list plus one appended ticker is linear, so this stays cheap.
         stock_list.sort()
 
         self.update_list(stock_list)
@@ -303,17 +394,19 @@ class Watchlist:
             return None
         
         # If meta_key is a default key, throw exception
-        if meta_key in self._default_keys:
+        if meta_key in _DEFAULT_KEYS:
             raise ValueError("Cannot delete a default key [title, stocks, version, date]")
         
         # If meta_key found in TOML keys
         if meta_key in self._toml_dict.keys():
             # Extract the value
             v = self._toml_dict[meta_key]
-            # Delete the key-value pair in local dictionary object
-            del self._toml_dict[meta_key]
+            # Delete the key-value pair in a copy of the local dictionary object
+            toml_dict: dict = dict(self._toml_dict)
+            del toml_dict[meta_key]
             # Update TOML file for deletion
-            self._update_toml_file("")
+            if self._write_toml_dict(toml_dict) != 0:
+                return None
 
             # Return the deleted key-value pair as a dictionary
             return {meta_key: v}
@@ -328,7 +421,7 @@ class Watchlist:
         """
         if ticker is None: raise ValueError("Ticker cannot be None type.")
 
-        stock_list: list = self.get_list()
+        stock_list: list = list(self.get_list())
         if ticker in stock_list:
             stock_list.remove(ticker)
         
@@ -384,7 +477,7 @@ class Watchlist:
             return None
         
         try:
-            if meta_key not in ['title', 'stocks', 'version', 'date']:
+            if meta_key not in _DEFAULT_KEYS:
                 return self._toml_dict[meta_key]
             raise ValueError("Do not use get_meta_data() to obtain values in default watchlist keys (titel, stocks, version, date).")
         except KeyError:
@@ -455,11 +548,60 @@ class Watchlist:
         if not new_list: raise ValueError("Cannot update watchlist with empty list.")
 
         try:
-            self._update_toml_file('stocks', new_list)
+            # Store a copy so later changes to new_list do not leak into the watchlist
+            if self._update_toml_file('stocks', list(new_list)) != 0:
+                return None
             return new_list
         except Exception:
             return None
     
+    def update_many(self, *, add=(), remove=(), meta: dict = None):
+        """
+        Applies several changes to the watchlist and writes the TOML file once.
+
+        Use this instead of repeated add_ticker/delete_ticker/update_meta_data calls when
+        making bulk edits.
+
+        Parameters:
+        -----------
+        - add: An iterable of tickers to add to the stock list. upper() is applied.
+        - remove: An iterable of tickers to remove from the stock list. Each ticker is removed both
+            as given and in its upper() form.
+        - meta: A dictionary of meta data key-value pairs to add or update. Values must be strings
+            and keys cannot be any of the default keys ['date', 'title', 'stocks', 'version'].
+
+        Returns a dictionary representing the updated watchlist file, or None if the update fails.
+        """
+        if add is None or remove is None: raise ValueError("Tickers to add or remove cannot be None-type.")
+        if isinstance(add, str) or isinstance(remove, str):
+            raise ValueError("Tickers to add or remove must be given as a list of strings, not a single string.")
+
+        # Verify meta data before anything is changed
+        if meta:
+            meta = _verify_and_clean_metadata(meta)
+
+        # Apply ticker changes
+        stocks: set = set(self.get_list())
+        for ticker in add:
+            if ticker is None: raise ValueError("Ticker cannot be None-type.")
+            stocks.add(ticker.upper())
+        for ticker in remove:
+            if ticker is None: raise ValueError("Ticker cannot be None-type.")
+            stocks.discard(ticker)
+            stocks.discard(ticker.upper())
+
+        if not stocks: raise ValueError("Cannot update watchlist with empty list.")
+
+        toml_dict: dict = {**self._toml_dict, 'stocks': sorted(stocks)}
+        if meta:
+            toml_dict.update(meta)
+
+        # Write all changes to the TOML file at once
+        if self._write_toml_dict(toml_dict) != 0:
+            return None
+
+        return self.load()
+
     def update_meta_data(self, meta_key:str, meta_value:str):
         """
         If the meta_key is found, updates the associated value and returns the updated value.
@@ -474,7 +616,7 @@ class Watchlist:
         # Meta key is found
         if meta_key in self._toml_dict.keys():
             # Meta key is not a default key
-            if meta_key not in self._default_keys:
+            if meta_key not in _DEFAULT_KEYS:
                 self._update_toml_file(meta_key, meta_value)
                 return meta_value
             else:
@@ -518,10 +660,8 @@ class Watchlist:
         ------------
         Takes in a key-value pair and overwrites the associated value in the TOML file.
 
-        If key is an empty string, a deletion is assumed to have occurred.
-        The internal _toml_dict is assumed to already have been updated.
-        The TOML file is then updated according to the _toml_dict object.
-        No update is required in this scenario.
+        The key-value is applied to a copy of the internal _toml_dict, which replaces
+        _toml_dict only once the TOML file has been written successfully.
 
         Parameters:
         -----------
@@ -529,38 +669,36 @@ class Watchlist:
         - key: The key to look up in the TOML watchlist file.
         - value: The value to assign for the given key in the TOML watchlist file.
         """
-        # Create a TOMLDocument object
-        doc = tomlkit.document()
+        return self._write_toml_dict({**self._toml_dict, key: value})
 
-        # Check for deletion case
-        if key == "":
-            # Deletion has taken place, copy ALL keys for overwrite.
-            for k in self._toml_dict.keys():
-                doc.add(k, self._toml_dict[k])
-        else:
-            # Copy over existing, unchanged key-value pairs
-            for k in self._toml_dict.keys():
-                if k != key:
-                    doc.add(k, self._toml_dict[k])
-            
-            # Copy over the modified key-value
-            doc.add(key, value)
-        
-        # Update TOML with changes
-        watchlist_filepath = _get_watchlist_directory() / self.get_filename()
+    def _write_toml_dict(self, toml_dict: dict):
+        """
+        !!!INTERNAL METHOD!!!
+        This method should only be used by the Watchlists library classes and functions. Outside use
+        is not suggested and may result in broken code and unexpected behavior.
+
+        Description:
+        ------------
+        Overwrites the TOML file with toml_dict and, on success, makes toml_dict the internal
+        _toml_dict. The internal _toml_dict is the source of truth, so the file is not re-read.
+
+        Returns 0 on success and -1 if the TOML file could not be written. On failure the internal
+        _toml_dict is left unchanged.
+
+        Raises a ValueError if toml_dict holds a value that cannot be written as TOML.
+        """
+        # Serialize before opening, so a failure cannot leave the file truncated
+        contents = _dump_watchlist(toml_dict)
 
         try:
-            with open(str(watchlist_filepath), 'w') as f:
-                f.write(tomlkit.dumps(doc))
+            with open(str(self._filepath), 'w') as f:
+                f.write(contents)
         except Exception as e:
             print("EXCEPTION: Raised exception while updating TOML file. Check pathing and file location.")
             return -1
-        finally:
-            f.close()
         
-        if key != "":
-            # Update the internal dictionary model
-            self._update_toml_dict()
+        # Update the internal dictionary model
+        self._toml_dict = toml_dict
         
         return 0
 
@@ -620,20 +758,21 @@ def create_watchlist(name: str, watchlist: list, version: str = "1", watchlist_d
         print("EXCEPTION: ", e.args)
         return None
     
-    # Create TOML Document Object
+    # Create TOML document dictionary
     doc = _create_toml_document_object(_watchlist_name, _watchlist_list, _watchlist_version, _watchlist_date, _watchlist_meta)
 
     # Create watchlist file in watchlists directory
     try:
         _watchlist_path: Path = _get_watchlist_directory() / _watchlist_name
+        contents = _dump_watchlist(doc)
         with open(str(_watchlist_path), 'w') as f:
-            f.write(tomlkit.dumps(doc))
+            f.write(contents)
     except Exception as e:
         print("Exception: Raised exception while creating TOML file. Check pathing and file location.")
         return None
     
     # Return Watchlist object
-    return Watchlist(filename = _watchlist_name)
+    return Watchlist._from_dict(_watchlist_name, doc)
 
 
 
@@ -660,8 +799,7 @@ def merge_watchlists(watchlist1:Watchlist, watchlist2:Watchlist, merged_name:str
     # Combine watchlist stock lists, remove duplicates
     list1:list = watchlist1.get_list()
     list2:list = watchlist2.get_list()
-    _watchlist_list: list = list1 + list(set(list2) - set(list1))
-    _watchlist_list.sort()
+    _watchlist_list: list = sorted(set(list1).union(list2))
 
     # Determine new watchlist name
     _watchlist_name: str = merged_name
@@ -673,7 +811,7 @@ def merge_watchlists(watchlist1:Watchlist, watchlist2:Watchlist, merged_name:str
         name2: str = watchlist2.get_filename().replace(".toml", "")
         _watchlist_name = name1 + "_" + name2 + ".toml"
     else:
-        if not _watchlist_name.upper().endswith(".TOML"):
+        if not _is_toml(_watchlist_name):
             _watchlist_name = _watchlist_name + ".toml"
     
     # Verify and clean version
@@ -704,28 +842,27 @@ def merge_watchlists(watchlist1:Watchlist, watchlist2:Watchlist, merged_name:str
     if extract_meta_from == 1:
         watchlist_dict = watchlist1.load()
         for key in watchlist_dict.keys():
-            if key not in ['date', 'title', 'version', 'stocks']:
-                _watchlist_meta_data[key] = watchlist_dict[key]
+            if key not in _DEFAULT_KEYS:
+                _watchlist_meta_data[key] = copy.deepcopy(watchlist_dict[key])
 
     elif extract_meta_from == 2:
         watchlist_dict = watchlist2.load()
         for key in watchlist_dict.keys():
-            if key not in ['date', 'title', 'version', 'stocks']:
-                _watchlist_meta_data[key] = watchlist_dict[key]
+            if key not in _DEFAULT_KEYS:
+                _watchlist_meta_data[key] = copy.deepcopy(watchlist_dict[key])
 
-    # Create TOML document object    
+    # Create TOML document dictionary
     doc = _create_toml_document_object(_watchlist_name, _watchlist_list, _watchlist_version, _watchlist_date, _watchlist_meta_data)
     
     # Create watchlist file in watchlists directory
     try:
         _watchlist_path: Path = _get_watchlist_directory() / _watchlist_name
+        contents = _dump_watchlist(doc)
         with open(str(_watchlist_path), 'w') as f:
-            f.write(tomlkit.dumps(doc))
+            f.write(contents)
     except Exception as e:
         print("Exception: Raised exception while creating TOML file. Check pathing and file location.")
         return None
-    finally:
-        f.close()
 
     # Return Watchlist object
-    return Watchlist(filename = _watchlist_name)
\ No newline at end of file
+    return Watchlist._from_dict(_watchlist_name, doc)
\ No newline at end of file